@@ -5,122 +5,307 @@ This module handles feature engineering, model training, and saving artifacts
 
 import pandas as pd
 import numpy as np
+import os
 import re
+import hashlib
 import pickle
 import json
+import multiprocessing
+from collections import Counter
+from html import unescape
+from html.entities import html5 as html5_entities
+from html.parser import HTMLParser
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from bs4 import BeautifulSoup
-from imblearn.over_sampling import SMOTE
 import xgboost as xgb
 import warnings
 
 warnings.filterwarnings('ignore')
 
+# Bump whenever extracted feature columns change, to invalidate cached features
+FEATURE_CACHE_VERSION = 1
+
+# Columns the pipeline reads from the training CSV
+CSV_COLUMNS = [
+    'domain_category', 'web_URL', 'violation_name', 'violation_score',
+    'affected_html_elements', 'violation_category', 'violation_impact',
+    'wcag_reference', 'supplementary_information',
+]
+
+
+class _TagStatsParser(HTMLParser):
+    """
+    Tally tag names and per-tag text length without building a tree.
+
+    Mirrors how BeautifulSoup's html.parser builder nests elements so the
+    counts and get_text() lengths match what the soup-based version produced:
+    void elements close immediately, stray end tags are ignored, and
+    whitespace-only strings collapse to a single character.
+    """
+
+    VOID_TAGS = {
+        'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed',
+        'frame', 'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link',
+        'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr',
+    }
+    # Text inside these belongs only to tags of the same kind (script, style, ...)
+    STRING_CONTAINERS = {'rt', 'rp', 'style', 'script', 'template'}
+    PRESERVE_WHITESPACE = {'pre', 'textarea'}
+    ASCII_SPACES = ' \n\t\x0c\r'
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.tag_counts = Counter()
+        self.has_inline_style = False
+        self._stack = []        # open tags as (name, text kind, text total at open)
+        self._closed = []       # text lengths of closed tags
+        self._text_totals = Counter()
+        self._closed_voids = []
+        self._pending = []
+
+    def _flush_text(self):
+        if not self._pending:
+            return
+        data = ''.join(self._pending)
+        self._pending = []
+        if (not any(name in self.PRESERVE_WHITESPACE for name, _, _ in self._stack)
+                and not data.strip(self.ASCII_SPACES)):
+            data = ' '
+        kind = next((name for name, _, _ in reversed(self._stack) if name in self.STRING_CONTAINERS), None)
+        self._text_totals[kind] += len(data)
+
+    def handle_starttag(self, tag, attrs, close_void=True):
+        self._flush_text()
+        self.tag_counts[tag] += 1
+        if any(name == 'style' for name, _ in attrs):
+            self.has_inline_style = True
+        kind = tag if tag in self.STRING_CONTAINERS else None
+        self._stack.append((tag, kind, self._text_totals[kind]))
+        if close_void and tag in self.VOID_TAGS:
+            self._pop_to(tag)
+            self._closed_voids.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, close_void=False)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        # Like BeautifulSoup, an end tag for an already-closed void element
+        # is swallowed, even when it comes from a later self-closing tag
+        if tag in self._closed_voids:
+            self._closed_voids.remove(tag)
+        else:
+            self._pop_to(tag)
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_charref(self, name):
+        self._pending.append(unescape(f'&#{name};'))
+
+    def handle_entityref(self, name):
+        self._pending.append(html5_entities.get(f'{name};', f'&{name}'))
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def unknown_decl(self, data):
+        self._flush_text()
+        if data.upper().startswith('CDATA['):
+            self._pending.append(data[len('CDATA['):])
+            self._flush_text()
+
+    def _pop_to(self, tag):
+        names = [name for name, _, _ in reversed(self._stack)]
+        if tag in names:
+            for _ in range(names.index(tag) + 1):
+                _, kind, start = self._stack.pop()
+                self._closed.append(self._text_totals[kind] - start)
+
+    def text_lengths(self):
+        """Text length of every element, including ones left unclosed"""
+        self._flush_text()
+        return self._closed + [self._text_totals[kind] - start for _, kind, start in self._stack]
+
 
 class AccessibilityFeatureExtractor:
     """Extract features from HTML and accessibility violation data"""
-    
+
+    # Narrowest dtype for each extract_html_features output
+    HTML_FEATURE_DTYPES = {
+        'num_links': 'int32', 'num_images': 'int32', 'num_buttons': 'int32',
+        'num_inputs': 'int32', 'num_lists': 'int32', 'num_headings': 'int32',
+        'has_form': 'int8', 'num_divs': 'int32', 'num_spans': 'int32',
+        'avg_text_len_per_tag': 'float32', 'has_inline_style': 'int8',
+        'has_script_or_style': 'int8',
+    }
+
+    # Literal substrings probed in the lowercased violating snippet
+    HTML_MARKERS = (
+        '<a', '<button', '<img', '<svg', 'id=', 'class=', 'role=', 'tabindex=',
+        'alt=', 'aria-hidden="true"', 'aria-label=',
+    )
+
     def __init__(self):
-        self.le_violation = LabelEncoder()
-        self.le_tag = LabelEncoder()
-        self.le_domain = LabelEncoder()
-        
-    def extract_everything(self, row):
-        """Extract all features from a row"""
-        html = str(row['affected_html_elements']).lower()
-        supp = str(row['supplementary_information']).lower()
-        v_name = str(row['violation_name']).lower()
-        wcag = str(row['wcag_reference']).upper()
+        # Sorted classes behind each integer-coded categorical column
+        self.le_violation_classes = []
+        self.le_tag_classes = []
+        self.le_domain_classes = []
+
+        # Compiled once and handed to the vectorized .str methods
+        self._tag_re = re.compile(r'<([a-zA-Z0-9]+)')
+        self._alt_re = re.compile(r'alt=["\'](.*?)["\']')
+        self._redundant_re = re.compile(r'(?:image of|photo of|picture of|link to|click here|button|graphic of)')
+        self._filename_re = re.compile(r'\.(?:jpg|png|gif|jpeg|svg|webp)$')
+        self._cr_re = re.compile(r"contrastratio':\s*([0-9.]+)")
+        self._fs_re = re.compile(r"fontsize':\s*['\"]([0-9.]+)")
+        # gov/edu/org label anywhere in the URL's host (e.g. www.gov.uk)
+        self._url_type_re = re.compile(
+            r'^(?:[a-z][a-z0-9+.-]*://)?[^/?#]*?\.(gov|edu|org)(?=[.:/?#]|$)', re.IGNORECASE
+        )
+
+    def extract_features(self, df):
+        """Extract all row features column-wise from a DataFrame"""
+        # Missing cells are empty text, whichever NA marker the reader used
+        html = df['affected_html_elements'].fillna('').astype(str).str.lower()
+        supp = df['supplementary_information'].fillna('').astype(str).str.lower()
+        v_name = df['violation_name'].fillna('').astype(str).str.lower()
+        wcag = df['wcag_reference'].fillna('').astype(str).str.upper()
+
+        # Shared scans of the snippet
+        hits = self._marker_hits(html)
+        word_count = html.str.split().str.len().astype('int32')
 
         # Tag Extraction
-        tag_match = re.search(r'<([a-zA-Z0-9]+)', html)
-        tag = tag_match.group(1) if tag_match else 'unknown'
+        tag = html.str.extract(self._tag_re, expand=False).fillna('unknown')
 
         # Alt Content Analysis
-        alt_match = re.search(r'alt=["\'](.*?)["\']', html)
-        alt_content = alt_match.group(1).strip() if alt_match else ""
+        alt_content = html.str.extract(self._alt_re, expand=False).fillna('').str.strip()
 
         # Technical Patterns (Heuristics)
-        redundant_pat = r'(image of|photo of|picture of|link to|click here|button|graphic of)'
         placeholder_set = {'alt', 'description', 'label', 'placeholder', 'none', 'image', 'spacer', 'icon', 'dot'}
 
         # Technical Metrics (Contrast & Font)
-        cr_match = re.search(r"contrastratio':\s*([0-9.]+)", supp)
-        fs_match = re.search(r"fontsize':\s*['\"]([0-9.]+)", supp)
+        contrast_ratio = supp.str.extract(self._cr_re, expand=False).astype('float32')
+        font_size = supp.str.extract(self._fs_re, expand=False).astype('float32')
 
-        return pd.Series({
+        return pd.DataFrame({
             # --- Structural & Tag Features ---
             'html_tag': tag,
-            'snippet_len': len(html),
-            'snippet_word_count': len(html.split()),
-            'tag_count': html.count('<'),
-            'word_count': len(html.split()),
-            'is_button_or_link': 1 if any(x in html for x in ['<a', '<button']) else 0,
-            'has_id': 1 if 'id=' in html else 0,
-            'has_class': 1 if 'class=' in html else 0,
-            'has_role_attr': 1 if 'role=' in html else 0,
-            'has_tabindex': 1 if 'tabindex=' in html else 0,
+            'snippet_len': html.str.len().astype('int32'),
+            'tag_count': html.str.count('<').astype('int32'),
+            'word_count': word_count,
+            'is_button_or_link': (hits['<a'] | hits['<button']).astype('int8'),
+            'has_id': hits['id='].astype('int8'),
+            'has_class': hits['class='].astype('int8'),
+            'has_role_attr': hits['role='].astype('int8'),
+            'has_tabindex': hits['tabindex='].astype('int8'),
 
             # --- Semantic & Alt-Text Features ---
-            'is_img_or_svg': 1 if any(x in html for x in ['<img', '<svg']) else 0,
-            'has_alt_attr': 1 if 'alt=' in html else 0,
-            'is_alt_empty': 1 if (alt_content == "" and 'alt=' in html) else 0,
-            'alt_word_count': len(alt_content.split()),
-            'alt_is_generic': 1 if alt_content in placeholder_set else 0,
-            'alt_is_filename': 1 if re.search(r'\.(jpg|png|gif|jpeg|svg|webp)$', alt_content) else 0,
-            'has_redundant_prefix': 1 if re.search(redundant_pat, html) else 0,
-            'is_aria_hidden': 1 if 'aria-hidden="true"' in html else 0,
-            'has_aria_label': 1 if 'aria-label=' in html else 0,
+            'is_img_or_svg': (hits['<img'] | hits['<svg']).astype('int8'),
+            'has_alt_attr': hits['alt='].astype('int8'),
+            'is_alt_empty': ((alt_content == '') & hits['alt=']).astype('int8'),
+            'alt_word_count': alt_content.str.split().str.len().astype('int32'),
+            'alt_is_generic': alt_content.isin(placeholder_set).astype('int8'),
+            'alt_is_filename': alt_content.str.contains(self._filename_re).astype('int8'),
+            'has_redundant_prefix': html.str.contains(self._redundant_re).astype('int8'),
+            'is_aria_hidden': hits['aria-hidden="true"'].astype('int8'),
+            'has_aria_label': hits['aria-label='].astype('int8'),
 
             # --- Technical & Metadata Features ---
-            'contrast_ratio': float(cr_match.group(1)) if cr_match else np.nan,
-            'font_size': float(fs_match.group(1)) if fs_match else np.nan,
-            'is_aria_related': 1 if ('aria' in v_name or 'aria' in supp) else 0,
-            'aria_density': supp.count('aria-'),
-            'supp_info_len': len(supp),
+            'contrast_ratio': contrast_ratio,
+            'font_size': font_size,
+            'is_aria_related': (v_name.str.contains('aria', regex=False)
+                                | supp.str.contains('aria', regex=False)).astype('int8'),
+            'aria_density': supp.str.count('aria-').astype('int32'),
+            'supp_info_len': supp.str.len().astype('int32'),
 
             # --- WCAG Intelligence ---
-            'wcag_level': 3 if 'AAA' in wcag else (2 if 'AA' in wcag else (1 if 'A' in wcag else 0))
-        })
+            # 'AAA' implies 'AA' implies 'A', so the nested flags sum to the level
+            'wcag_level': sum(
+                wcag.str.contains(level, regex=False).to_numpy(dtype=np.int8)
+                for level in ('A', 'AA', 'AAA')
+            ),
+        }, index=df.index)
+
+    def extract_url_features(self, urls):
+        """Extract URL depth, length and domain-type flags from a Series of URLs"""
+        urls = urls.fillna('').astype(str)
+        domain_type = urls.str.extract(self._url_type_re, expand=False).str.lower()
+
+        return pd.DataFrame({
+            'url_depth': (urls.str.count('/') - 2).astype('int32'),
+            'url_len': urls.str.len().astype('int32'),
+            'is_gov': (domain_type == 'gov').astype('int8'),
+            'is_edu': (domain_type == 'edu').astype('int8'),
+            'is_org': (domain_type == 'org').astype('int8'),
+        }, index=urls.index)
+
+    def _marker_hits(self, html):
+        """
+        Test every HTML_MARKERS substring in one pass over the snippets.
+
+        Each row's matches are packed into a uint16 bitmask and then unpacked
+        into one boolean Series per marker. Plain `in` checks are used because
+        CPython's substring search beat a single alternation-regex scan here.
+        """
+        bits = [(marker, 1 << i) for i, marker in enumerate(self.HTML_MARKERS)]
+        mask = np.fromiter(
+            (sum(bit for marker, bit in bits if marker in s) for s in html),
+            dtype=np.uint16,
+            count=len(html),
+        )
+        return {marker: pd.Series((mask & bit) != 0, index=html.index) for marker, bit in bits}
 
     def extract_html_features(self, html):
-        """Extract features from HTML using BeautifulSoup"""
+        """Extract features from HTML with a single streaming parse"""
         if pd.isna(html):
             html = ""
 
-        soup = BeautifulSoup(str(html), "html.parser")
+        parser = _TagStatsParser()
+        parser.feed(str(html))
+        parser.close()
+        tags = parser.tag_counts
+        text_lens = parser.text_lengths()
 
         return {
-            "num_links": len(soup.find_all('a')),
-            "num_images": len(soup.find_all(['img', 'svg'])),
-            "num_buttons": len(soup.find_all('button')),
-            "num_inputs": len(soup.find_all('input')),
-            "num_lists": len(soup.find_all(['ul', 'ol', 'li'])),
-            "num_headings": len(soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])),
-            "has_form": int(soup.find('form') is not None),
-            "num_divs": len(soup.find_all('div')),
-            "num_spans": len(soup.find_all('span')),
-            "avg_text_len_per_tag": np.mean([len(t.get_text()) for t in soup.find_all()]) if soup.find_all() else 0,
-            "has_inline_style": int(soup.find(attrs={'style': True}) is not None),
-            "has_script_or_style": int(soup.find(['script', 'style']) is not None),
+            "num_links": tags['a'],
+            "num_images": tags['img'] + tags['svg'],
+            "num_buttons": tags['button'],
+            "num_inputs": tags['input'],
+            "num_lists": tags['ul'] + tags['ol'] + tags['li'],
+            "num_headings": sum(tags[h] for h in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')),
+            "has_form": int(tags['form'] > 0),
+            "num_divs": tags['div'],
+            "num_spans": tags['span'],
+            "avg_text_len_per_tag": np.mean(text_lens) if text_lens else 0,
+            "has_inline_style": int(parser.has_inline_style),
+            "has_script_or_style": int(tags['script'] + tags['style'] > 0),
         }
 
 
-def train_and_save_model(csv_path='Access_to_Tech_Dataset.csv', model_dir='models'):
-    """
-    Train the XGBoost model and save all artifacts
-    
-    Args:
-        csv_path: Path to the training data CSV
-        model_dir: Directory to save model artifacts
-    """
-    import os
-    os.makedirs(model_dir, exist_ok=True)
-    
+def _encode_categorical(values):
+    """Integer-code a column via pandas categoricals, returning (codes, sorted classes)"""
+    cat = values.astype('category')
+    return cat.cat.codes, cat.cat.categories.tolist()
+
+
+def _build_feature_frame(csv_path, extractor):
+    """Load the training CSV and run all row-level feature extraction"""
     # Load data
     print("Loading data...")
-    df = pd.read_csv(csv_path)
+    df = pd.read_csv(
+        csv_path,
+        engine='pyarrow',
+        usecols=CSV_COLUMNS,
+        dtype={'violation_score': 'int8'},
+    )
     
     # Clean categorical columns
     print("Preprocessing data...")
@@ -132,30 +317,66 @@ def train_and_save_model(csv_path='Access_to_Tech_Dataset.csv', model_dir='model
     df['impact_numeric'] = df['violation_impact'].map(impact_map).fillna(1)
     df['severity_score'] = df['impact_numeric'] / 4.0
 
-    # Initialize feature extractor
-    extractor = AccessibilityFeatureExtractor()
-    
     # Extract features
     print("Extracting features...")
-    feature_df = df.apply(extractor.extract_everything, axis=1)
-    df = pd.concat([df, feature_df], axis=1)
+    feature_df = extractor.extract_features(df)
+
+    # Extract HTML features. The same widget markup repeats across pages, so
+    # parse each distinct snippet once (spread across cores) and gather back
+    codes, supp = pd.factorize(df['supplementary_information'].fillna(''))
+    supp = supp.tolist()
+    n_workers = os.cpu_count() or 1
+    if n_workers > 1:
+        with multiprocessing.Pool(n_workers) as pool:
+            chunksize = max(1, len(supp) // (n_workers * 4))
+            html_features = pool.map(extractor.extract_html_features, supp, chunksize=chunksize)
+    else:
+        html_features = [extractor.extract_html_features(h) for h in supp]
+    html_features_df = pd.DataFrame(html_features).astype(extractor.HTML_FEATURE_DTYPES).take(codes)
+
+    # Attach the feature columns in place instead of concatenating a new frame
+    for block in (feature_df, html_features_df):
+        for col in block.columns:
+            df[col] = block[col].to_numpy()
+
+    return df
+
+
+def train_and_save_model(csv_path='Access_to_Tech_Dataset.csv', model_dir='models', use_cache=True):
+    """
+    Train the XGBoost model and save all artifacts
+    
+    Args:
+        csv_path: Path to the training data CSV
+        model_dir: Directory to save model artifacts
+        use_cache: Reuse extracted features cached in model_dir for this CSV
+    """
+    os.makedirs(model_dir, exist_ok=True)
+
+    # Initialize feature extractor
+    extractor = AccessibilityFeatureExtractor()
+
+    # Extracted features are cached per CSV content
+    with open(csv_path, 'rb') as f:
+        csv_key = hashlib.md5(f.read()).hexdigest()[:12]
+    cache_path = f'{model_dir}/features_v{FEATURE_CACHE_VERSION}_{csv_key}.parquet'
 
-    # Extract HTML features
-    html_features = df['supplementary_information'].apply(extractor.extract_html_features)
-    html_features_df = pd.DataFrame(list(html_features))
-    df = pd.concat([df, html_features_df], axis=1)
+    if use_cache and os.path.exists(cache_path):
+        print(f"Loading cached features from {cache_path}...")
+        df = pd.read_parquet(cache_path)
+    else:
+        df = _build_feature_frame(csv_path, extractor)
+        df.to_parquet(cache_path, compression='zstd')
 
     # Domain & URL intelligence
-    df['domain_encoded'] = extractor.le_domain.fit_transform(df['domain_category'])
-    df['url_depth'] = df['web_URL'].str.count('/') - 2
-    df['url_len'] = df['web_URL'].str.len()
-    df['is_gov'] = df['web_URL'].str.contains('.gov', case=False, na=False).astype(int)
-    df['is_edu'] = df['web_URL'].str.contains('.edu', case=False, na=False).astype(int)
-    df['is_org'] = df['web_URL'].str.contains('.org', case=False, na=False).astype(int)
+    df['domain_encoded'], extractor.le_domain_classes = _encode_categorical(df['domain_category'])
+    url_df = extractor.extract_url_features(df['web_URL'])
+    for col in url_df.columns:
+        df[col] = url_df[col].to_numpy()
 
     # Encode categorical features
-    df['violation_id_enc'] = extractor.le_violation.fit_transform(df['violation_name'].astype(str))
-    df['tag_enc'] = extractor.le_tag.fit_transform(df['html_tag'].astype(str))
+    df['violation_id_enc'], extractor.le_violation_classes = _encode_categorical(df['violation_name'].astype(str))
+    df['tag_enc'], extractor.le_tag_classes = _encode_categorical(df['html_tag'].astype(str))
 
     # Define features for model
     features = [
@@ -171,17 +392,19 @@ def train_and_save_model(csv_path='Access_to_Tech_Dataset.csv', model_dir='model
         'is_aria_related',
         'contrast_ratio',
         'font_size',
-        'num_links', 'num_images', 'num_buttons', 'num_inputs', 'num_lists',
-        'num_headings', 'has_form', 'num_divs', 'num_spans',
-        'avg_text_len_per_tag', 'has_inline_style', 'has_script_or_style'
+        # Generic container counts (inputs, lists, divs, spans) and the average
+        # text length mostly restate tag_count, so only these are kept
+        'num_links', 'num_images', 'num_buttons', 'num_headings', 'has_form',
+        'has_inline_style', 'has_script_or_style'
     ]
 
     # Keep only features that exist
     available_features = [f for f in features if f in df.columns]
     
-    # Prepare data
-    X = df[available_features].fillna(0)
-    y = df['violation_score']
+    # Prepare data: NaN-fill and float32 cast in one copy (XGBoost bins in
+    # float32 internally, so nothing is lost)
+    X = df[available_features].to_numpy(dtype=np.float32, na_value=0)
+    y = df['violation_score'].to_numpy(dtype=np.int8)
 
     # Score mapping
     score_mapping = {2: 0, 3: 1, 4: 2, 5: 3}
@@ -193,42 +416,70 @@ def train_and_save_model(csv_path='Access_to_Tech_Dataset.csv', model_dir='model
         X, y, test_size=0.2, random_state=42, stratify=y
     )
 
-    # Map scores
-    y_train_mapped = y_train.map(score_mapping)
-    y_test_mapped = y_test.map(score_mapping)
+    # Map scores with a lookup-table gather (unknown scores would become -1)
+    score_lookup = np.full(max(score_mapping) + 1, -1, dtype=np.int8)
+    score_lookup[list(score_mapping)] = list(score_mapping.values())
+    y_train_mapped = score_lookup[y_train]
 
-    # Apply SMOTE
-    print("Applying SMOTE...")
-    smote = SMOTE(random_state=42)
-    X_train_smote, y_train_smote = smote.fit_resample(X_train, y_train_mapped)
+    # Hold out part of the training rows to decide when to stop boosting
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train_mapped, test_size=0.1, random_state=42, stratify=y_train_mapped
+    )
+
+    # Balance classes with per-sample weights, scaled so the majority class
+    # keeps weight 1 (the same balance SMOTE used to oversample to)
+    class_counts = np.bincount(y_fit)
+    sample_weights = (class_counts.max() / class_counts)[y_fit]
+
+    # Build each DMatrix once from float32 arrays
+    dtrain = xgb.DMatrix(
+        X_fit, label=y_fit, weight=sample_weights, feature_names=available_features,
+    )
+    dval = xgb.DMatrix(X_val, label=y_val, feature_names=available_features)
+    dtest = xgb.DMatrix(X_test, feature_names=available_features)
 
     # Train model
     print("Training XGBoost model...")
-    xgb_clf = xgb.XGBClassifier(
-        n_estimators=150,
-        learning_rate=0.1,
-        max_depth=6,
-        objective='multi:softprob',
-        num_class=len(y_train.unique()),
-        random_state=42,
-        eval_metric='mlogloss'
+    xgb_params = {
+        'learning_rate': 0.1,
+        'max_depth': 6,
+        'tree_method': 'hist',
+        'objective': 'multi:softprob',
+        'num_class': len(np.unique(y_train)),
+        'seed': 42,
+        'eval_metric': 'mlogloss',
+    }
+    train_kwargs = dict(
+        num_boost_round=150,
+        evals=[(dval, 'validation')],
+        early_stopping_rounds=20,
+        verbose_eval=False,
     )
-    xgb_clf.fit(X_train_smote, y_train_smote)
+    try:
+        booster = xgb.train({**xgb_params, 'device': 'cuda'}, dtrain, **train_kwargs)
+    except xgb.core.XGBoostError:
+        # XGBoost build without CUDA support
+        print("GPU training unavailable, falling back to CPU...")
+        booster = xgb.train({**xgb_params, 'device': 'cpu'}, dtrain, **train_kwargs)
+
+    # Drop the rounds trained after the best validation score
+    booster = booster[:booster.best_iteration + 1]
+    print(f"Boosting rounds kept: {booster.num_boosted_rounds()}")
 
     # Save model and artifacts
     print(f"Saving model to {model_dir}/...")
     
     # Save XGBoost model
-    xgb_clf.save_model(f'{model_dir}/xgb_model.json')
+    booster.save_model(f'{model_dir}/xgb_model.json')
     
     # Save encoders and mappings
     artifacts = {
         'feature_names': available_features,
         'score_mapping': score_mapping,
         'reverse_mapping': reverse_mapping,
-        'le_violation_classes': extractor.le_violation.classes_.tolist(),
-        'le_tag_classes': extractor.le_tag.classes_.tolist(),
-        'le_domain_classes': extractor.le_domain.classes_.tolist(),
+        'le_violation_classes': extractor.le_violation_classes,
+        'le_tag_classes': extractor.le_tag_classes,
+        'le_domain_classes': extractor.le_domain_classes,
     }
     
     with open(f'{model_dir}/model_artifacts.pkl', 'wb') as f:
@@ -240,18 +491,21 @@ def train_and_save_model(csv_path='Access_to_Tech_Dataset.csv', model_dir='model
     
     print("Model training complete!")
     print(f"Available features: {len(available_features)}")
-    print(f"Training samples: {len(X_train_smote)}")
+    print(f"Training samples: {len(X_fit)}")
+    print(f"Validation samples: {len(X_val)}")
     print(f"Test samples: {len(X_test)}")
     
     # Test prediction
-    y_pred = xgb_clf.predict(X_test)
-    y_pred_original = pd.Series(y_pred).map(reverse_mapping)
+    y_pred = booster.predict(dtest).argmax(axis=1)
+    # Class indices are 0..K-1, so the reverse mapping is a lookup-table gather
+    reverse_lookup = np.array([reverse_mapping[i] for i in range(len(reverse_mapping))], dtype=np.int8)
+    y_pred_original = reverse_lookup[y_pred]
     
     from sklearn.metrics import accuracy_score
     accuracy = accuracy_score(y_test, y_pred_original)
     print(f"Test Accuracy: {accuracy:.4f}")
     
-    return xgb_clf, artifacts, X_test, y_test
+    return booster, artifacts, X_test, y_test
 
 
 if __name__ == "__main__":